@@ -1,9 +1,17 @@
 #!/bin/sh
 
-CMD="python jackett2telegram.py --token ${TOKEN} --chat_id ${CHATID} --delay ${DELAY} --log_level ${LOG_LEVEL}"
+CMD="python jackett2telegram.py --token ${TOKEN} --chat_id ${CHATID} --delay ${DELAY} --log_level ${LOG_LEVEL} --log_format ${LOG_FORMAT:-text} --log_debug_sample_rate ${LOG_DEBUG_SAMPLE_RATE:-1.0} --metadata_provider ${METADATA_PROVIDER:-none} --metadata_ttl ${METADATA_TTL:-604800} --metadata_timeout ${METADATA_TIMEOUT:-30} --config_poll_interval ${CONFIG_POLL_INTERVAL:-30} --max_feed_size ${MAX_FEED_SIZE:-0} --max_feed_items ${MAX_FEED_ITEMS:-0} --max_torrent_size ${MAX_TORRENT_SIZE:-0} --log_queue_size ${LOG_QUEUE_SIZE:-0}"
 
 if [ -n "${MESSAGE_THREAD_ID}" ]; then
     CMD="${CMD} --message_thread_id ${MESSAGE_THREAD_ID}"
 fi
 
+if [ -n "${TMDB_API_KEY}" ]; then
+    CMD="${CMD} --tmdb_api_key ${TMDB_API_KEY}"
+fi
+
+if [ -n "${RECORD_PATH}" ]; then
+    CMD="${CMD} --record ${RECORD_PATH} --record_keep ${RECORD_KEEP:-144}"
+fi
+
 exec ${CMD}
\ No newline at end of file
@@ -1,13 +1,29 @@
-import inspect
+import asyncio
+import cProfile
+import gzip
+import io
+import json
 import logging
 import os
+import pstats
+import queue
+import random
 import requests
 import sqlite3
 import string
+import tempfile
+import time
+import tomllib
+import tracemalloc
 import unicodedata
 
+from abc import ABC, abstractmethod
 from argparse import ArgumentParser
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from types import SimpleNamespace
 from telegram import (
     Message,
     helpers,
@@ -32,6 +48,7 @@ from xml.etree import ElementTree
 blackhole_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "blackhole")
 config_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), "config")
 db_path = os.path.join(config_path, "rss.db")
+config_file = os.path.join(config_path, "jackett2telegram.toml")
 os.makedirs(blackhole_path, exist_ok=True)
 os.makedirs(config_path, exist_ok=True)
 
@@ -39,6 +56,35 @@ rss_dict = {}
 
 escaped_backslash = helpers.escape_markdown("-", 2)
 char_limit = 255
+torznab_ns = {"torznab": "http://torznab.com/schemas/2015/feed"}
+metadata_provider = None
+metadata_ttl = 604800
+metadata_timeout = 30
+
+log_indexer: ContextVar[str | None] = ContextVar("log_indexer", default=None)
+log_sweep: ContextVar[int | None] = ContextVar("log_sweep", default=None)
+sweep_counter = count(1)
+log_listener = None
+log_handler = None
+config_mtime = None
+rss_job = None
+log_levels = ["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"]
+
+# Memory caps, 0 means unlimited.
+max_feed_size = 0
+max_feed_items = 0
+max_torrent_size = 0
+
+sweep_lock = asyncio.Lock()
+profile_snapshot = None
+
+record_path = None
+record_keep = 144
+feed_recording: ContextVar[dict | None] = ContextVar("feed_recording", default=None)
+metadata_recording: ContextVar[dict | None] = ContextVar(
+    "metadata_recording", default=None
+)
+feed_replay = None
 
 
 class TopicFilter(MessageFilter):
@@ -53,6 +99,108 @@ class TopicFilter(MessageFilter):
 topic_filter = TopicFilter()
 
 
+class FeedTooBigError(ValueError):
+    pass
+
+
+# LOGGING
+
+
+class LogContextFilter(logging.Filter):
+    # Runs in the caller's context, so the indexer and sweep being processed
+    # are captured before the record is handed over to the listener thread.
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.indexer = log_indexer.get()
+        record.sweep = log_sweep.get()
+        return True
+
+
+class DebugSampleFilter(logging.Filter):
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        return random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "caller": record.funcName,
+            "message": record.getMessage(),
+        }
+        for field in ("indexer", "sweep"):
+            if (value := getattr(record, field, None)) is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class AsyncLogHandler(QueueHandler):
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # A bounded queue drops records instead of blocking the event loop.
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep the message and the traceback apart so the listener's formatter
+        # decides how to render them (plain text or JSON).
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def init_logging(
+    level: str, log_format: str, debug_sample_rate: float, queue_size: int
+) -> None:
+    global log_listener
+    global log_handler
+
+    handler = logging.StreamHandler()
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s"
+            )
+        )
+
+    log_queue = queue.Queue(queue_size) if queue_size else queue.SimpleQueue()
+    queue_handler = AsyncLogHandler(log_queue)
+    if debug_sample_rate < 1:
+        queue_handler.addFilter(DebugSampleFilter(debug_sample_rate))
+    queue_handler.addFilter(LogContextFilter())
+
+    logging.basicConfig(level=level, handlers=[queue_handler])
+    log_handler = queue_handler
+    log_listener = QueueListener(log_queue, handler)
+    log_listener.start()
+
+
+def log_report_dropped() -> None:
+    if log_handler and (dropped := log_handler.dropped):
+        log_handler.dropped = 0
+        logging.warning(f"{dropped} log records were dropped, the log queue was full.")
+
+
 # SQLITE
 
 
@@ -63,6 +211,9 @@ def init_sqlite() -> None:
     c.execute(
         """CREATE TABLE IF NOT EXISTS rss (name text PRIMARY KEY, link text, last_pubdate text, last_items text, is_down integer)"""
     )
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS metadata (key text PRIMARY KEY, title text, year text, rating real, poster text, expires_at integer)"""
+    )
 
 
 def sqlite_connect() -> None:
@@ -93,15 +244,385 @@ def sqlite_write(
     conn.close()
 
 
+def sqlite_update_state(
+    name: str, link: str, last_pubdate: str, last_items: str, is_down: int
+) -> None:
+    # Only touches the row the sweep read, so it never re-creates an indexer
+    # removed meanwhile nor moves one back to its old link.
+    sqlite_connect()
+    c = conn.cursor()
+    c.execute(
+        """UPDATE rss SET last_pubdate = ?, last_items = ?, is_down = ? WHERE name = ? AND link = ?""",
+        (last_pubdate, last_items, is_down, name, link),
+    )
+    conn.commit()
+    conn.close()
+
+
+def sqlite_metadata_load(keys: list[str]) -> dict[str, dict[str, Any] | None]:
+    sqlite_connect()
+    c = conn.cursor()
+    c.execute(
+        f"""SELECT key,title,year,rating,poster FROM metadata WHERE expires_at > ? AND key IN ({",".join("?" * len(keys))})""",
+        [int(time.time()), *keys],
+    )
+    rows = c.fetchall()
+    conn.close()
+    # A row without title is a cached miss: the provider knows nothing about it.
+    return {
+        row[0]: (
+            {"title": row[1], "year": row[2], "rating": row[3], "poster": row[4]}
+            if row[1]
+            else None
+        )
+        for row in rows
+    }
+
+
+def sqlite_metadata_write(entries: dict[str, dict[str, Any] | None]) -> None:
+    sqlite_connect()
+    c = conn.cursor()
+    now = int(time.time())
+    c.execute("DELETE FROM metadata WHERE expires_at <= ?", (now,))
+    c.executemany(
+        """REPLACE INTO metadata (key,title,year,rating,poster,expires_at) VALUES(?,?,?,?,?,?)""",
+        [
+            (
+                key,
+                (entry or {}).get("title"),
+                (entry or {}).get("year"),
+                (entry or {}).get("rating"),
+                (entry or {}).get("poster"),
+                now + metadata_ttl,
+            )
+            for key, entry in entries.items()
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def sqlite_sync_indexers(indexers: dict[str, str], last_pubdate: str) -> None:
+    sqlite_connect()
+    c = conn.cursor()
+    c.execute("SELECT name, link FROM rss")
+    current = dict(c.fetchall())
+    for name in current.keys() - indexers.keys():
+        c.execute("DELETE FROM rss WHERE name = ?", (name,))
+    for name, link in indexers.items():
+        if name not in current:
+            c.execute(
+                """INSERT INTO rss (name,link,last_pubdate,last_items,is_down) VALUES(?,?,?,?,?)""",
+                (name, link, last_pubdate, str([]), 0),
+            )
+        elif current[name] != link:
+            c.execute(
+                "UPDATE rss SET link = ?, is_down = 0 WHERE name = ?", (link, name)
+            )
+    conn.commit()
+    conn.close()
+
+
+# CONFIG
+
+
+def config_load(path: str) -> dict[str, Any]:
+    with open(path, "rb") as file:
+        config = tomllib.load(file)
+
+    unknown = config.keys() - {
+        "chat_id",
+        "message_thread_id",
+        "delay",
+        "log_level",
+        "max_feed_size",
+        "max_feed_items",
+        "max_torrent_size",
+        "indexers",
+    }
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    if "chat_id" in config:
+        if not isinstance(config["chat_id"], (str, int)) or not config["chat_id"]:
+            raise ValueError("chat_id must be a non-empty string or integer")
+        config["chat_id"] = str(config["chat_id"])
+    if "message_thread_id" in config and type(config["message_thread_id"]) is not int:
+        raise ValueError("message_thread_id must be an integer")
+    if "delay" in config and (type(config["delay"]) is not int or config["delay"] <= 0):
+        raise ValueError("delay must be a positive integer")
+    if "log_level" in config:
+        if str(config["log_level"]).upper() not in log_levels:
+            raise ValueError(f"log_level must be one of {', '.join(log_levels)}")
+        config["log_level"] = config["log_level"].upper()
+    for name in ("max_feed_size", "max_feed_items", "max_torrent_size"):
+        if name in config and (type(config[name]) is not int or config[name] < 0):
+            raise ValueError(f"{name} must be a non-negative integer (0 is unlimited)")
+    if "indexers" in config:
+        if not isinstance(config["indexers"], dict):
+            raise ValueError("indexers must be a table of TITLE = RSS_FEED_URL")
+        for name, link in config["indexers"].items():
+            if not isinstance(link, str) or not link.startswith(
+                ("http://", "https://")
+            ):
+                raise ValueError(f"Indexer {name} must have an http(s) RSS Feed Url")
+    return config
+
+
+def config_changes(config: dict[str, Any]) -> list[str]:
+    current = {
+        "chat_id": chat_id,
+        "message_thread_id": message_thread_id,
+        "delay": delay,
+        "log_level": log_level,
+        "max_feed_size": max_feed_size,
+        "max_feed_items": max_feed_items,
+        "max_torrent_size": max_torrent_size,
+    }
+    changes = [
+        f"{name}: {value} -> {config[name]}"
+        for name, value in current.items()
+        if name in config and config[name] != value
+    ]
+    if (indexers := config.get("indexers")) is not None:
+        for name, link in sorted(indexers.items()):
+            if name not in rss_dict:
+                changes.append(f"Indexer {name}: added")
+            elif rss_dict[name][0] != link:
+                changes.append(f"Indexer {name}: link changed")
+        for name in sorted(rss_dict.keys() - indexers.keys()):
+            changes.append(f"Indexer {name}: removed")
+    return changes
+
+
+def config_apply(config: dict[str, Any], job_queue: Any) -> None:
+    # Nothing here awaits, so the running bot never sees a half-applied config.
+    global chat_id
+    global message_thread_id
+    global delay
+    global log_level
+    global rss_job
+    global max_feed_size
+    global max_feed_items
+    global max_torrent_size
+
+    chat_id = config.get("chat_id", chat_id)
+    message_thread_id = config.get("message_thread_id", message_thread_id)
+    max_feed_size = config.get("max_feed_size", max_feed_size)
+    max_feed_items = config.get("max_feed_items", max_feed_items)
+    max_torrent_size = config.get("max_torrent_size", max_torrent_size)
+    if config.get("log_level", log_level) != log_level:
+        log_level = config["log_level"]
+        logging.getLogger().setLevel(log_level)
+    if config.get("delay", delay) != delay:
+        delay = config["delay"]
+        if rss_job and job_queue:
+            rss_job.schedule_removal()
+            rss_job = job_queue.run_repeating(rss_monitor, delay)
+    if (indexers := config.get("indexers")) is not None:
+        # New indexers start from now, like /add does with the latest release.
+        now = datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S %z")
+        sqlite_sync_indexers(indexers, now)
+        rss_load()
+
+
+async def config_watch(context: ContextTypes.DEFAULT_TYPE) -> None:
+    global config_mtime
+
+    try:
+        mtime = os.stat(config_file).st_mtime
+    except FileNotFoundError:
+        return
+    if mtime == config_mtime:
+        return
+    config_mtime = mtime
+
+    try:
+        config = config_load(config_file)
+    except (OSError, ValueError) as exception:
+        await telegram_send_error(
+            context,
+            f"Configuration file not applied: {helpers.escape_markdown(str(exception), 2)}",
+        )
+        return
+
+    # Applied between sweeps, a running one would write back its stale indexers.
+    async with sweep_lock:
+        if changes := config_changes(config):
+            config_apply(config, context.job_queue)
+    if changes:
+        await telegram_send_message(
+            context,
+            "*Configuration reloaded\.*\n"
+            + "\n".join(helpers.escape_markdown(change, 2) for change in changes),
+        )
+
+
+async def cmd_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if not its_me(update):
+        return
+
+    try:
+        config = config_load(config_file)
+    except FileNotFoundError:
+        await telegram_send_reply_error(
+            update, "The configuration file does not exist\."
+        )
+        return
+    except (OSError, ValueError) as exception:
+        await telegram_send_reply_error(
+            update,
+            f"The configuration file is not valid: {helpers.escape_markdown(str(exception), 2)}",
+        )
+        return
+
+    changes = config_changes(config) or ["No changes."]
+    await telegram_send_reply_text(
+        update,
+        "*Configuration changes \(dry run\)\.*\n"
+        + "\n".join(helpers.escape_markdown(change, 2) for change in changes),
+    )
+
+
+# METADATA
+
+
+class MetadataProvider(ABC):
+    @abstractmethod
+    def lookup(self, key: str, timeout: float) -> dict[str, Any] | None: ...
+
+    def lookup_many(
+        self, keys: list[str], deadline: float
+    ) -> dict[str, dict[str, Any] | None]:
+        # Keys that fail or run out of time are left out, so they are not
+        # cached and get retried in the next fetching.
+        results = {}
+        for index, key in enumerate(keys):
+            if (remaining := deadline - time.monotonic()) <= 0:
+                logging.warning(
+                    f"Metadata lookups ran out of time, {len(keys) - index} left."
+                )
+                break
+            try:
+                results[key] = self.lookup(key, remaining)
+            # Only the status or error type is logged, messages may carry URLs.
+            except requests.HTTPError as exception:
+                logging.warning(
+                    f"Metadata lookup for {key} failed with status {exception.response.status_code}."
+                )
+            except Exception as exception:
+                logging.warning(
+                    f"Metadata lookup for {key} failed: {type(exception).__name__}."
+                )
+        return results
+
+
+class StubMetadataProvider(MetadataProvider):
+    def __init__(self, entries: dict[str, dict[str, Any] | None] | None = None):
+        self.entries = entries
+        self.lookups = []
+
+    def lookup(self, key: str, timeout: float) -> dict[str, Any] | None:
+        self.lookups.append(key)
+        if self.entries is not None:
+            return self.entries.get(key)
+        return {"title": key, "year": None, "rating": None, "poster": None}
+
+
+class TmdbMetadataProvider(MetadataProvider):
+    api_url = "https://api.themoviedb.org/3"
+    image_url = "https://image.tmdb.org/t/p/w500"
+
+    def __init__(self, api_key: str):
+        self.session = requests.Session()
+        # In a header, the key never shows up in URLs logged by errors.
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def lookup(self, key: str, timeout: float) -> dict[str, Any] | None:
+        source, _, id = key.partition(":")
+        if source == "imdb":
+            results = self.get(f"find/{id}", timeout, external_source="imdb_id") or {}
+            found = results.get("movie_results") or results.get("tv_results")
+            return self.to_metadata(found[0]) if found else None
+        return self.to_metadata(self.get(id.replace(":", "/"), timeout))
+
+    def get(self, path: str, timeout: float, **params: str) -> dict[str, Any] | None:
+        response = self.session.get(
+            f"{self.api_url}/{path}", params=params, timeout=min(timeout, 10)
+        )
+        # Unknown ids are a miss to cache, not a failure to retry.
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def to_metadata(self, result: dict[str, Any] | None) -> dict[str, Any] | None:
+        if not result:
+            return None
+        title = result.get("title") or result.get("name")
+        if not title:
+            return None
+        date = result.get("release_date") or result.get("first_air_date") or ""
+        poster_path = result.get("poster_path")
+        return {
+            "title": title,
+            "year": date[:4] or None,
+            "rating": result.get("vote_average") or None,
+            "poster": f"{self.image_url}{poster_path}" if poster_path else None,
+        }
+
+
+def item_metadata_key(item: ElementTree.Element) -> str | None:
+    attrs = {
+        torznabattr.get("name"): torznabattr.get("value")
+        for torznabattr in item.findall("torznab:attr", torznab_ns)
+    }
+    if imdbid := attrs.get("imdbid"):
+        imdbid = imdbid if imdbid.startswith("tt") else f"tt{imdbid.zfill(7)}"
+        return f"imdb:{imdbid}"
+    if (tmdbid := attrs.get("tmdbid")) and item.findall("category"):
+        category = parse_category(item.findtext("category", ""))
+        if category == 2:
+            return f"tmdb:movie:{tmdbid}"
+        elif category == 5:
+            return f"tmdb:tv:{tmdbid}"
+    return None
+
+
+async def enrich_items(
+    items: list[ElementTree.Element],
+) -> list[dict[str, Any] | None]:
+    if metadata_provider is None or not items:
+        return [None] * len(items)
+
+    keys = [item_metadata_key(item) for item in items]
+    # Episodes of the same show share a key, so each one is looked up once.
+    unique_keys = sorted({key for key in keys if key})
+    metadata = sqlite_metadata_load(unique_keys) if unique_keys else {}
+    if missing_keys := [key for key in unique_keys if key not in metadata]:
+        logging.debug(f"Looking up metadata for {len(missing_keys)} releases.")
+        # Lookups block on the network, keep them off the event loop and
+        # bound the whole batch by one deadline.
+        fetched = await asyncio.to_thread(
+            metadata_provider.lookup_many,
+            missing_keys,
+            time.monotonic() + metadata_timeout,
+        )
+        if fetched:
+            sqlite_metadata_write(fetched)
+        metadata.update(fetched)
+
+    if (recording := metadata_recording.get()) is not None:
+        recording.update(metadata)
+    return [metadata.get(key) if key else None for key in keys]
+
+
 # RSS
 
 
 def rss_load() -> None:
-    # if the dict is not empty, empty it.
-    if bool(rss_dict):
-        rss_dict.clear()
-    for row in sqlite_load_all():
-        rss_dict[row[0]] = (row[1], row[2], row[3], row[4])
+    global rss_dict
+    # Swap in a new dict so a sweep in progress keeps iterating its own copy.
+    rss_dict = {row[0]: (row[1], row[2], row[3], row[4]) for row in sqlite_load_all()}
 
 
 async def cmd_rss_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -135,8 +656,7 @@ async def cmd_rss_add(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     try:
-        response = requests.get(context.args[1])
-        root = ElementTree.fromstring(response.content)
+        root = feed_fetch(context.args[1])
         channel = root.find("channel")
         items = channel.findall("item") if channel is not None else []
     except ElementTree.ParseError:
@@ -150,6 +670,12 @@ async def cmd_rss_add(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             update, "The _Jackett or Prowlarr RSS Feed Url_ is malformed\."
         )
         return
+    except FeedTooBigError:
+        await telegram_send_reply_error(
+            update,
+            f"The _Jackett or Prowlarr RSS Feed_ is bigger than the {max_feed_size} bytes limit\.",
+        )
+        return
 
     items.sort(
         reverse=True, key=lambda item: pubDate_to_datetime(item.findtext("pubDate", ""))
@@ -221,6 +747,9 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         + "\n\- /remove TITLE \- Removes the RSS link\."
         + "\n\- /list \- Lists all the titles and the asociated Jackett or Prowlarr RSS links from the DB\."
         + "\n\- /test JACKETT\_OR\_PROWLARR\_RSS\_FEED\_URL \- Inbuilt command that fetches a post \(usually latest\) from a Jackett or Prowlarr RSS\."
+        + "\n\- /config \- Shows the changes the configuration file would apply, without applying them\."
+        + "\n\- /profile \[TOP\_N\] \- Runs a profiled fetching and reports the top time and memory consumers\."
+        + "\n\- /profile stop \- Stops the memory tracing started by /profile\."
         + "\n\nIn order to use *Blackhole*, your _Torrent_ client must support it and be configured to point to *Jackett2Telegram* _Blackhole_ folder\."
         "\n\nIf you like the project, consider [BECOME A SPONSOR](https://github.com/sponsors/danimart1991)\."
     )
@@ -233,17 +762,103 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
 
 
+def feed_fetch(url: str) -> ElementTree.Element:
+    if feed_replay is not None:
+        recorded = feed_replay[url]
+        if "error" in recorded:
+            raise Exception(recorded["error"])
+        return feed_parse([recorded["body"].encode("utf-8", "surrogateescape")])
+
+    recording = feed_recording.get()
+    body = []
+
+    def chunks(response: requests.Response):
+        for chunk in response.iter_content(chunk_size=65536):
+            if recording is not None:
+                body.append(chunk)
+            yield chunk
+
+    try:
+        with requests.get(url, stream=True) as response:
+            return feed_parse(chunks(response))
+    except Exception as exception:
+        if recording is not None and not body:
+            recording[url] = {"error": str(exception)}
+        raise
+    finally:
+        # Bad or oversized bodies are kept too, replay fails the same way.
+        # Bodies are stored as text, non UTF-8 bytes survive as surrogates.
+        if recording is not None and body:
+            recording[url] = {"body": b"".join(body).decode("utf-8", "surrogateescape")}
+
+
+def feed_parse(chunks) -> ElementTree.Element:
+    # Parse while downloading so the raw body and the full tree are never held
+    # together, and drop items beyond the cap as soon as they are parsed.
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = channel = None
+    size = items = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if max_feed_size and size > max_feed_size:
+            raise FeedTooBigError(f"Feed is bigger than {max_feed_size} bytes")
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            elif event == "start" and element.tag == "channel":
+                channel = element
+            elif event == "end" and element.tag == "item" and channel is not None:
+                items += 1
+                if max_feed_items and items > max_feed_items:
+                    channel.remove(element)
+    parser.close()
+    if root is None:
+        raise ElementTree.ParseError("no element found")
+    return root
+
+
 async def rss_monitor(context: ContextTypes.DEFAULT_TYPE) -> None:
+    # /profile runs sweeps on demand, they must not overlap with the job ones.
+    async with sweep_lock:
+        await rss_sweep(context)
+
+
+async def rss_sweep(context: ContextTypes.DEFAULT_TYPE) -> None:
+    # Always run in its own task (jobs get one, /profile and replay create
+    # one), so these context values never leak to the caller.
+    sweep = next(sweep_counter)
+    log_sweep.set(sweep)
+    logging.debug(f"Sweep started with {len(rss_dict)} indexers.")
+    if record_path:
+        recording = {
+            "sweep": sweep,
+            "time": datetime.now(timezone.utc).isoformat(),
+            "chat_id": chat_id,
+            "message_thread_id": message_thread_id,
+            # The caps decide which items are kept, replay must use the same.
+            "max_feed_size": max_feed_size,
+            "max_feed_items": max_feed_items,
+            "db": sqlite_load_all(),
+            "feeds": {},
+            # Replays resolve releases from these, never from the provider.
+            "metadata": {} if metadata_provider else None,
+        }
+        feed_recording.set(recording["feeds"])
+        metadata_recording.set(recording["metadata"])
+    pending = []
     for rss_name, rss_props in rss_dict.items():
+        log_indexer.set(rss_name)
         try:
-            response = requests.get(rss_props[0])
-            root = ElementTree.fromstring(response.content)
+            root = feed_fetch(rss_props[0])
             if root.tag == "error":
                 code = root.attrib["code"]
                 description = root.attrib["description"]
                 if code == "410" or code == "429":
                     logging.info(f"Indexer {rss_name} is disabled.")
-                    sqlite_write(rss_name, rss_props[0], rss_props[1], rss_props[2], 2)
+                    sqlite_update_state(
+                        rss_name, rss_props[0], rss_props[1], rss_props[2], 2
+                    )
                 else:
                     raise Exception(f"{code}: {description}")
             else:
@@ -262,34 +877,197 @@ async def rss_monitor(context: ContextTypes.DEFAULT_TYPE) -> None:
 
                 if sortedFilteredItems:
                     last_items = eval(rss_props[2])
+                    newItems = []
                     for item in sortedFilteredItems:
                         item_guid = item.findtext("guid", "")
                         if item_guid not in last_items:
                             last_items.append(item_guid)
-                            await jackettitem_to_telegram(context, item, rss_name)
+                            newItems.append(item)
 
                     itemsCount = len(items)
                     while len(last_items) > itemsCount:
                         last_items.pop(0)
 
                     new_pubdate = sortedFilteredItems[-1].findtext("pubDate", "")
-                    sqlite_write(
-                        rss_name, rss_props[0], new_pubdate, str(last_items), 0
+                    pending.append(
+                        (rss_name, rss_props, newItems, new_pubdate, last_items)
                     )
         except Exception as exception:
-            # If not down yet, put down and send message.
-            if rss_props[3] != 1:
-                msg = f"Indexer {helpers.escape_markdown(rss_name, 2)} not available due to some issue\."
-                await context.bot.send_message(
-                    chat_id,
-                    f"*ERROR:* {msg}",
-                    parse_mode="MARKDOWNV2",
-                    message_thread_id=message_thread_id,
-                )
-                logging.exception(f"{msg}: {exception}")
-                sqlite_write(rss_name, rss_props[0], rss_props[1], rss_props[2], 1)
+            await rss_indexer_down(context, rss_name, rss_props, exception)
+
+    # One deduped lookup for the whole sweep, so every indexer shares it and
+    # its deadline.
+    log_indexer.set(None)
+    metadata = iter(
+        await enrich_items([item for entry in pending for item in entry[2]])
+    )
+
+    for rss_name, rss_props, newItems, new_pubdate, last_items in pending:
+        log_indexer.set(rss_name)
+        # Consumed up front, so a failed send does not shift other indexers.
+        items_metadata = [next(metadata) for _ in newItems]
+        try:
+            for item, item_metadata in zip(newItems, items_metadata):
+                await jackettitem_to_telegram(context, item, rss_name, item_metadata)
 
+            sqlite_update_state(rss_name, rss_props[0], new_pubdate, str(last_items), 0)
+        except Exception as exception:
+            await rss_indexer_down(context, rss_name, rss_props, exception)
+
+    # What follows is about the whole sweep, not the last indexer.
+    log_indexer.set(None)
     rss_load()
+    log_report_dropped()
+    if record_path:
+        sweep_record_write(recording)
+
+
+async def rss_indexer_down(
+    context: ContextTypes.DEFAULT_TYPE,
+    rss_name: str,
+    rss_props: tuple,
+    exception: Exception,
+) -> None:
+    # If not down yet, put down and send message.
+    if rss_props[3] != 1:
+        msg = f"Indexer {helpers.escape_markdown(rss_name, 2)} not available due to some issue\."
+        await context.bot.send_message(
+            chat_id,
+            f"*ERROR:* {msg}",
+            parse_mode="MARKDOWNV2",
+            message_thread_id=message_thread_id,
+        )
+        logging.error(f"{msg}: {exception}", exc_info=exception)
+        sqlite_update_state(rss_name, rss_props[0], rss_props[1], rss_props[2], 1)
+
+
+def sweep_record_write(recording: dict[str, Any]) -> None:
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    path = os.path.join(record_path, f"sweep-{timestamp}-{recording['sweep']}.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        # Keep ensure_ascii, surrogates of non UTF-8 bodies can't be encoded.
+        json.dump(recording, file)
+    logging.debug(f"Sweep recorded to {path}.")
+
+    if record_keep:
+        records = sorted(
+            (
+                os.path.join(record_path, file)
+                for file in os.listdir(record_path)
+                if file.startswith("sweep-") and file.endswith(".json.gz")
+            ),
+            key=os.path.getmtime,
+        )
+        for old_path in records[:-record_keep]:
+            os.remove(old_path)
+
+
+class ReplayBot:
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def send_message(self, chat_id: str, text: str, **kwargs: Any) -> None:
+        self.record("send_message", chat_id, text, None, kwargs)
+
+    async def send_photo(
+        self, chat_id: str, photo: Any, caption: str, **kwargs: Any
+    ) -> None:
+        self.record("send_photo", chat_id, caption, photo, kwargs)
+
+    def record(
+        self, method: str, chat_id: str, text: str, photo: Any, kwargs: dict
+    ) -> None:
+        reply_markup = kwargs.get("reply_markup")
+        self.messages.append(
+            {
+                "method": method,
+                "chat_id": chat_id,
+                "message_thread_id": kwargs.get("message_thread_id"),
+                "text": text,
+                "photo": photo,
+                "buttons": (
+                    [
+                        [button.text, button.url or button.callback_data]
+                        for row in reply_markup.inline_keyboard
+                        for button in row
+                    ]
+                    if reply_markup
+                    else []
+                ),
+            }
+        )
+
+
+async def sweep_replay(path: str) -> None:
+    global db_path
+    global chat_id
+    global message_thread_id
+    global feed_replay
+    global metadata_provider
+    global max_feed_size
+    global max_feed_items
+
+    # Only releases missing from the recording reach it, an empty stub keeps
+    # the replay offline and deterministic.
+    replay_provider = StubMetadataProvider({})
+
+    if os.path.isdir(path):
+        files = [
+            os.path.join(path, file)
+            for file in sorted(os.listdir(path))
+            if file.startswith("sweep-") and file.endswith(".json.gz")
+        ]
+    else:
+        files = [path]
+
+    total_messages = 0
+    total_elapsed = 0.0
+    with tempfile.TemporaryDirectory() as replay_path:
+        db_path = os.path.join(replay_path, "rss.db")
+        for file in files:
+            with gzip.open(file, "rt", encoding="utf-8") as archive:
+                recording = json.load(archive)
+
+            # Every sweep starts from its own recorded state, so each one can
+            # be replayed and compared on its own.
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            init_sqlite()
+            for row in recording["db"]:
+                sqlite_write(*row)
+            rss_load()
+            if (metadata := recording.get("metadata")) is None:
+                metadata_provider = None
+            else:
+                if metadata:
+                    sqlite_metadata_write(metadata)
+                metadata_provider = replay_provider
+            chat_id = recording["chat_id"]
+            message_thread_id = recording["message_thread_id"]
+            max_feed_size = recording["max_feed_size"]
+            max_feed_items = recording["max_feed_items"]
+            feed_replay = recording["feeds"]
+
+            bot = ReplayBot()
+            start = time.perf_counter()
+            await asyncio.create_task(rss_sweep(SimpleNamespace(bot=bot)))
+            elapsed = time.perf_counter() - start
+
+            for message in bot.messages:
+                print(
+                    json.dumps(
+                        {"sweep": recording["sweep"], **message}, ensure_ascii=False
+                    )
+                )
+            logging.info(
+                f"Replayed {os.path.basename(file)}: {len(bot.messages)} messages in {elapsed:.3f}s"
+            )
+            total_messages += len(bot.messages)
+            total_elapsed += elapsed
+
+    logging.info(
+        f"Replayed {len(files)} sweeps: {total_messages} messages in {total_elapsed:.3f}s"
+    )
 
 
 async def cmd_test(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -305,8 +1083,7 @@ async def cmd_test(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     try:
-        response = requests.get(context.args[0])
-        root = ElementTree.fromstring(response.content)
+        root = feed_fetch(context.args[0])
         channel = root.find("channel")
         if channel is None:
             return
@@ -323,15 +1100,26 @@ async def cmd_test(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             update, "The _Jackett or Prowlarr RSS Feed Url_ is malformed\."
         )
         return
+    except FeedTooBigError:
+        await telegram_send_reply_error(
+            update,
+            f"The _Jackett or Prowlarr RSS Feed_ is bigger than the {max_feed_size} bytes limit\.",
+        )
+        return
 
     items.sort(
         reverse=True, key=lambda item: pubDate_to_datetime(item.findtext("pubDate", ""))
     )
-    await jackettitem_to_telegram(context, items[0], title)
+    await jackettitem_to_telegram(
+        context, items[0], title, (await enrich_items(items[:1]))[0]
+    )
 
 
 async def jackettitem_to_telegram(
-    context: ContextTypes.DEFAULT_TYPE, item: ElementTree.Element, rssName: str
+    context: ContextTypes.DEFAULT_TYPE,
+    item: ElementTree.Element,
+    rssName: str,
+    metadata: dict[str, Any] | None = None,
 ) -> None:
     coverurl = None
     title = helpers.escape_markdown(
@@ -379,9 +1167,8 @@ async def jackettitem_to_telegram(
             keyboard[0].append(InlineKeyboardButton("💾", url=downloadUrl))
             keyboard[0].append(InlineKeyboardButton("🕳", callback_data="blackhole"))
     reply_markup = InlineKeyboardMarkup(keyboard)
-    ns = {"torznab": "http://torznab.com/schemas/2015/feed"}
 
-    for torznabattr in item.findall("torznab:attr", ns):
+    for torznabattr in item.findall("torznab:attr", torznab_ns):
         torznabattr_name = torznabattr.get("name")
         if torznabattr_name == "downloadvolumefactor":
             downloadvolumefactor = parse_downloadvolumefactor(
@@ -418,9 +1205,22 @@ async def jackettitem_to_telegram(
         elif torznabattr_name == "magneturl" and not magnetUrl:
             magnetUrl = torznabattr.get("value")
 
+    metadataInfo = ""
+    if metadata:
+        metadataInfo = f"\n🎞 *{helpers.escape_markdown(metadata['title'], 2)}*"
+        if metadata.get("year"):
+            metadataInfo += f" \\({helpers.escape_markdown(metadata['year'], 2)}\\)"
+        if metadata.get("rating"):
+            metadataInfo += (
+                f" ⭐ {helpers.escape_markdown(str(round(metadata['rating'], 1)), 2)}"
+            )
+        if not coverurl:
+            coverurl = metadata.get("poster")
+
     externalLinks = ("\n📌 " + "\|".join(externalLinks)) if externalLinks else ""
     message = (
         f"{helpers.escape_markdown('|'.join(icons),2)} \- {title} by _{trackerName}_"
+        + f"{metadataInfo}"
         + f"{externalLinks}"
         + f"\n\n📤 {seeders} 📥 {peers} 💾 {grabs} 🗜 {size} 🗃 {files}"
         + f"\n\n{downloadvolumefactor}{uploadvolumefactor}\n\n`{magnetUrl}`"
@@ -428,7 +1228,11 @@ async def jackettitem_to_telegram(
 
     if coverurl:
         try:
-            coverraw = requests.get(coverurl, stream=True).raw
+            coverraw = (
+                coverurl
+                if feed_replay is not None
+                else requests.get(coverurl, stream=True).raw
+            )
             await context.bot.send_photo(
                 chat_id,
                 photo=coverraw,
@@ -479,13 +1283,15 @@ async def cbq_to_blackhole(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         if torrent_file:
             torrent_file = clean_filename(torrent_file + ".torrent")
             try:
-                torrent_data = requests.get(torrent_url)
-                if torrent_data and torrent_data.content:
-                    button_msg = "✔️"
-                    with open(os.path.join(blackhole_path, torrent_file), "wb") as file:
-                        file.write(torrent_data.content)
-                else:
-                    msg = "Can't obtain `.Torrent` file data\."
+                with requests.get(torrent_url, stream=True) as torrent_data:
+                    if torrent_data and download_to_file(
+                        torrent_data,
+                        os.path.join(blackhole_path, torrent_file),
+                        max_torrent_size,
+                    ):
+                        button_msg = "✔️"
+                    else:
+                        msg = "Can't obtain `.Torrent` file data\."
             except Exception as exception:
                 if exception.args[0] and "magnet:?" in exception.args[0]:
                     msg = "It seems that the torrent is a magnet file, it can't be added using blackhole, please use another option\."
@@ -520,28 +1326,104 @@ async def post_init(application: Application) -> None:
         + f"\nDelay: {str(delay)} seconds"
         + f"\nLog Level: {log_level}"
     )
-    clean_msg = msg.replace("\n", "  ")
-    logging.info(f"{inspect.stack()[1][3]} - {clean_msg}")
+    logging.info(msg.replace("\n", "  "))
     await application.bot.send_message(
         chat_id, msg, message_thread_id=message_thread_id
     )
 
 
+async def cmd_profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    global profile_snapshot
+
+    if not its_me(update):
+        return
+
+    if context.args and context.args[0] == "stop":
+        if not tracemalloc.is_tracing():
+            await telegram_send_reply_error(update, "Memory tracing is not running\.")
+            return
+        tracemalloc.stop()
+        profile_snapshot = None
+        await telegram_send_reply_text(update, "*Memory tracing stopped\.*")
+        return
+
+    try:
+        top = int(context.args[0]) if context.args else 10
+        if top < 1:
+            raise ValueError(top)
+    except ValueError:
+        await telegram_send_reply_error(
+            update, "The format needs to be:\n`/profile [TOP_N|stop]`"
+        )
+        return
+
+    # Tracing has a cost per allocation, so it only runs once asked for.
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        profile_snapshot = None
+
+    profiler = cProfile.Profile()
+    async with sweep_lock:
+        profiler.enable()
+        try:
+            # Handlers run in the long-lived update fetcher task, a task of
+            # its own keeps the sweep's log context out of later updates.
+            await asyncio.create_task(rss_sweep(context))
+        finally:
+            profiler.disable()
+
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+    report = profile_report(profiler, snapshot, profile_snapshot, top)
+    profile_snapshot = snapshot
+
+    # Inside a pre block only ` and \ need to be escaped. Cut afterwards to fit
+    # Telegram's 4096 characters, never leaving half an escape at the end.
+    report = report.replace("\\", "\\\\").replace("`", "\\`")
+    report = report[:4000].rstrip("\\")
+    await telegram_send_reply_text(update, f"```\n{report}\n```")
+
+
+def profile_report(
+    profiler: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot,
+    previous: tracemalloc.Snapshot | None,
+    top: int,
+) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(top)
+
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [
+        f"Sweep: {stats.total_calls} calls in {stats.total_tt:.3f}s",
+        stream.getvalue().split("\n\n", 2)[-1].strip(),
+        "",
+        f"Traced memory: {current / 1048576:.1f}MiB now, {peak / 1048576:.1f}MiB peak",
+    ]
+    if previous:
+        lines.append("Top allocation growth since last /profile:")
+        allocations = snapshot.compare_to(previous, "lineno")
+    else:
+        lines.append("Memory tracing started, next /profile shows the growth.")
+        lines.append("Top allocations since tracing started:")
+        allocations = snapshot.statistics("lineno")
+    lines.extend(str(allocation) for allocation in allocations[:top])
+    return "\n".join(lines)
+
+
 # Telegram
 
 
 async def telegram_send_message(context: ContextTypes.DEFAULT_TYPE, msg: str) -> None:
-    clean_msg = msg.replace("\n", "  ")
-    logging.info(f"{inspect.stack()[1][3]} - {clean_msg}")
+    logging.info(msg.replace("\n", "  "), stacklevel=2)
     if bot := context.bot:
-        await bot.send_message(
-            chat_id, f"*ERROR:* {msg}", message_thread_id=message_thread_id
-        )
+        await bot.send_message(chat_id, msg, message_thread_id=message_thread_id)
 
 
 async def telegram_send_error(context: ContextTypes.DEFAULT_TYPE, msg: str) -> None:
-    clean_msg = msg.replace("\n", "  ")
-    logging.error(f"{inspect.stack()[1][3]} - {clean_msg}")
+    logging.error(msg.replace("\n", "  "), stacklevel=2)
     if bot := context.bot:
         await bot.send_message(
             chat_id, f"*ERROR:* {msg}", message_thread_id=message_thread_id
@@ -549,15 +1431,13 @@ async def telegram_send_error(context: ContextTypes.DEFAULT_TYPE, msg: str) -> N
 
 
 async def telegram_send_reply_text(update: Update, msg: str) -> None:
-    clean_msg = msg.replace("\n", "  ")
-    logging.info(f"{inspect.stack()[1][3]} - {clean_msg}")
+    logging.info(msg.replace("\n", "  "), stacklevel=2)
     if message := update.effective_message:
         await message.reply_text(msg)
 
 
 async def telegram_send_reply_error(update: Update, msg: str) -> None:
-    clean_msg = msg.replace("\n", "  ")
-    logging.error(f"{inspect.stack()[1][3]} - {clean_msg}")
+    logging.error(msg.replace("\n", "  "), stacklevel=2)
     if message := update.effective_message:
         await message.reply_text(f"*ERROR:* {msg}")
 
@@ -603,6 +1483,26 @@ def clean_filename(filename: str) -> str:
     return cleaned_filename[:char_limit]
 
 
+def download_to_file(response: requests.Response, path: str, max_size: int) -> int:
+    # Written under a temporary name, so a client watching the folder never
+    # picks up a partial file.
+    part_path = f"{path}.part"
+    size = 0
+    try:
+        with open(part_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size=65536):
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise ValueError(f"Download is bigger than {max_size} bytes")
+                file.write(chunk)
+        if size:
+            os.replace(part_path, path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return size
+
+
 def pubDate_to_datetime(pubDate: str) -> datetime:
     return datetime.strptime(pubDate, "%a, %d %b %Y %H:%M:%S %z")
 
@@ -654,20 +1554,20 @@ def parse_categoryIcon(category: int) -> str:
 
 
 def main() -> None:
+    global config_file
+
     parser = ArgumentParser()
     parser.add_argument(
         "--token",
         dest="token",
         type=str,
         help="Telegram Bot's unique authentication token.",
-        required=True,
     )
     parser.add_argument(
         "--chat_id",
         dest="chat_id",
         type=str,
         help="Unique identifier for the target chat or username of the target channel (in the format @channelusername); for supergroups, use the unique identifier.",
-        required=True,
     )
     parser.add_argument(
         "--message_thread_id",
@@ -687,25 +1587,180 @@ def main() -> None:
         "--log_level",
         dest="log_level",
         help="Set the level of console logs",
-        choices=["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"],
+        choices=log_levels,
         default=logging.getLevelName(logging.INFO),
     )
+    parser.add_argument(
+        "--log_format",
+        dest="log_format",
+        help="Set the format of console logs",
+        choices=["text", "json"],
+        default="text",
+    )
+    parser.add_argument(
+        "--log_debug_sample_rate",
+        dest="log_debug_sample_rate",
+        type=float,
+        help="Fraction (0 to 1) of DEBUG logs to keep, useful to reduce high-volume debug output",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--metadata_provider",
+        dest="metadata_provider",
+        help="Provider used to enrich releases with title, year, rating and poster",
+        choices=["none", "tmdb"],
+        default="none",
+    )
+    parser.add_argument(
+        "--tmdb_api_key",
+        dest="tmdb_api_key",
+        type=str,
+        help="TMDb API Read Access Token; required by the tmdb metadata provider.",
+        default=None,
+    )
+    parser.add_argument(
+        "--metadata_ttl",
+        dest="metadata_ttl",
+        type=int,
+        help="Seconds that release metadata is kept in the cache",
+        default=604800,
+    )
+    parser.add_argument(
+        "--metadata_timeout",
+        dest="metadata_timeout",
+        type=int,
+        help="Seconds allowed for all the metadata lookups of a fetching",
+        default=30,
+    )
+    parser.add_argument(
+        "--config",
+        dest="config",
+        type=str,
+        help="TOML configuration file, watched for changes while the bot runs",
+        default=config_file,
+    )
+    parser.add_argument(
+        "--config_poll_interval",
+        dest="config_poll_interval",
+        type=int,
+        help="Seconds between each check of the configuration file for changes",
+        default=30,
+    )
+    parser.add_argument(
+        "--max_feed_size",
+        dest="max_feed_size",
+        type=int,
+        help="Maximum bytes read from an RSS feed, bigger feeds fail (0 is unlimited)",
+        default=0,
+    )
+    parser.add_argument(
+        "--max_feed_items",
+        dest="max_feed_items",
+        type=int,
+        help="Maximum items kept from each RSS feed (0 is unlimited)",
+        default=0,
+    )
+    parser.add_argument(
+        "--max_torrent_size",
+        dest="max_torrent_size",
+        type=int,
+        help="Maximum bytes of a .torrent file saved to the blackhole (0 is unlimited)",
+        default=0,
+    )
+    parser.add_argument(
+        "--log_queue_size",
+        dest="log_queue_size",
+        type=int,
+        help="Maximum log records waiting to be written, extra ones are dropped (0 is unlimited)",
+        default=0,
+    )
+    parser.add_argument(
+        "--record",
+        dest="record",
+        type=str,
+        help="Directory where the feeds and database state of each fetching are recorded",
+        default=None,
+    )
+    parser.add_argument(
+        "--record_keep",
+        dest="record_keep",
+        type=int,
+        help="Number of recorded fetchings kept, the oldest are removed (0 is unlimited)",
+        default=144,
+    )
+    parser.add_argument(
+        "--replay",
+        dest="replay",
+        type=str,
+        help="Replays a recorded fetching (or a directory of them) with a fake bot, prints the messages that would be sent and exits",
+        default=None,
+    )
     args = parser.parse_args()
+    if not args.replay and not args.token:
+        parser.error("the following arguments are required: --token")
+    if args.replay and args.metadata_provider != "none":
+        parser.error("--replay uses the recorded metadata, not a metadata provider")
 
     global chat_id
     global message_thread_id
     global delay
     global log_level
+    global metadata_provider
+    global metadata_ttl
+    global metadata_timeout
+    global config_mtime
+    global rss_job
+    global max_feed_size
+    global max_feed_items
+    global max_torrent_size
+    global record_path
+    global record_keep
 
     chat_id = args.chat_id
     message_thread_id = args.message_thread_id
     delay = args.delay
     log_level = args.log_level
+    config_file = args.config
 
-    logging.basicConfig(
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=log_level
+    config = None
+    if os.path.exists(config_file):
+        try:
+            config_mtime = os.stat(config_file).st_mtime
+            config = config_load(config_file)
+        except (OSError, ValueError) as exception:
+            parser.error(f"{config_file}: {exception}")
+        log_level = config.get("log_level", log_level)
+
+    if not args.replay and not chat_id and not (config and "chat_id" in config):
+        parser.error(
+            "--chat_id is required, unless chat_id is set in the configuration file"
+        )
+
+    init_logging(
+        log_level, args.log_format, args.log_debug_sample_rate, args.log_queue_size
     )
 
+    max_feed_size = args.max_feed_size
+    max_feed_items = args.max_feed_items
+    max_torrent_size = args.max_torrent_size
+
+    metadata_ttl = args.metadata_ttl
+    metadata_timeout = args.metadata_timeout
+    if args.metadata_provider == "tmdb":
+        if not args.tmdb_api_key:
+            parser.error("--tmdb_api_key is required by the tmdb metadata provider")
+        metadata_provider = TmdbMetadataProvider(args.tmdb_api_key)
+
+    if args.replay:
+        asyncio.run(sweep_replay(args.replay))
+        log_listener.stop()
+        return
+
+    if args.record:
+        record_path = args.record
+        record_keep = args.record_keep
+        os.makedirs(record_path, exist_ok=True)
+
     defaults = Defaults(
         link_preview_options=LinkPreviewOptions(is_disabled=True),
         do_quote=True,
@@ -725,6 +1780,10 @@ def main() -> None:
     application.add_handler(CommandHandler("help", cmd_help, filters=topic_filter))
     application.add_handler(CommandHandler("test", cmd_test, filters=topic_filter))
     application.add_handler(CommandHandler("list", cmd_rss_list, filters=topic_filter))
+    application.add_handler(CommandHandler("config", cmd_config, filters=topic_filter))
+    application.add_handler(
+        CommandHandler("profile", cmd_profile, filters=topic_filter)
+    )
     application.add_handler(
         CommandHandler("remove", cmd_rss_remove, filters=topic_filter)
     )
@@ -738,13 +1797,19 @@ def main() -> None:
 
     rss_load()
 
+    if config:
+        config_apply(config, None)
+
     if job_queue := application.job_queue:
-        job_queue.run_repeating(rss_monitor, delay)
+        rss_job = job_queue.run_repeating(rss_monitor, delay)
+        job_queue.run_repeating(config_watch, args.config_poll_interval)
 
     application.add_error_handler(error_handler)
 
     application.run_polling()
     conn.close()
+    if log_listener:
+        log_listener.stop()
 
 
 if __name__ == "__main__":